@@ -1,5 +1,5 @@
 
-import json, os, logging
+import json, os, logging, stat, threading, time
 logger = logging.getLogger(__name__)
 # Note, this logger will be overridden due the logger
 # itself using this module for a logging file name
@@ -20,7 +20,7 @@ class FileErrorHandler:
             if exc_type in (ValueError, json.decoder.JSONDecodeError):
                 # If there is a ValueError or json.decoder.JSONDecodeError,
                 # we want to let the user know their settings.json file is incorrect.
-                raise ValueError("There is an error in your settings file.")
+                raise ValueError(f"There is an error in your settings file: {exc_value}") from exc_value
 
             elif exc_type is FileNotFoundError:
                 # If the file is missing, create a standardised settings.json file
@@ -44,26 +44,261 @@ class FileErrorHandler:
         return False
 
 class Settings:
-    """ Loads data from settings.json into the bot """
+    """ Loads data from settings.json into the bot, and keeps the two in sync while it runs """
 
     PATH = os.path.dirname(__file__) + "/settings.json"
     #PATH = "/content/TwitchAIDungeon/settings.json"
+
+    # Seconds between checks of settings.json for changes
+    WATCH_INTERVAL = 2
+    # Seconds to wait after the last mod command change before writing settings.json
+    SAVE_DELAY = 5
+
+    # Settings that need a new IRC connection to take effect
+    CONNECTION_KEYS = ("Host", "Port", "Channel", "Nickname", "Authentication")
+
+    # Optional settings that can be changed while the bot is running,
+    # mapped to the bot attribute they set and the type they must have.
+    RUNTIME_KEYS = {
+        "CollectingTime": ("collecting_time", int),
+        "VotingTime": ("voting_time", int),
+        "VoteCooldown": ("vote_cooldown", int),
+        "StreamDelay": ("stream_delay", int),
+        "MaxCandidates": ("commands_collected_max", int),
+        "Autovote": ("autovote", bool),
+        "RandomCollection": ("random_collection", bool),
+        "SkipVoting": ("skip_voting", bool),
+        "SendingMessage": ("sending_message", bool),
+    }
+
+    # Values used for runtime settings until settings.json has them.
+    # They are only written to the file once a mod command changes one of them.
+    DEFAULTS = {
+        "CollectingTime": 120,
+        "VotingTime": 120,
+        "VoteCooldown": 120,
+        "StreamDelay": 2,
+        "MaxCandidates": 5,
+        "Autovote": False,
+        "RandomCollection": False,
+        "SkipVoting": False,
+        "SendingMessage": True,
+    }
+
     def __init__(self, bot):
+        self.bot = bot
+        self.lock = threading.RLock()
+        self.save_timer = None
+        # Whether settings.json was valid when it was last read
+        self.valid = True
+        # Set when a save was refused because settings.json was invalid
+        self.unsaved = False
+        self.watcher = None
+        self.stopping = threading.Event()
+
         with FileErrorHandler():
             # Try to load the file using json.
             # And pass the data to the Bot class instance if this succeeds.
             logger.debug("Starting setting settings...")
-            with open(Settings.PATH, "r") as f:
-                settings = f.read()
-                data = json.loads(settings)
-                bot.set_settings(data["Host"],
-                                data["Port"],
-                                data["Channel"],
-                                data["Nickname"],
-                                data["Authentication"],
-                                data["AllowedRanks"],
-                                data["AllowedUsers"])
-                logger.debug("Finished setting settings.")
+            mtime, data = self.read()
+            self.validate(data)
+            bot.set_settings(data["Host"],
+                            data["Port"],
+                            data["Channel"],
+                            data["Nickname"],
+                            data["Authentication"],
+                            data["AllowedRanks"],
+                            data["AllowedUsers"])
+            bot.update_settings(self.get_runtime_updates(data))
+            self.data = data
+            self.mtime = mtime
+            logger.debug("Finished setting settings.")
+
+    @staticmethod
+    def read():
+        # Returns the modification time of settings.json along with its parsed contents
+        with open(Settings.PATH, "r") as f:
+            mtime = os.fstat(f.fileno()).st_mtime_ns
+            return mtime, json.loads(f.read())
+
+    @staticmethod
+    def validate(data):
+        # Raises a ValueError describing the first invalid field in data
+        if not isinstance(data, dict):
+            raise ValueError("Settings must be a json object.")
+
+        for key in Settings.CONNECTION_KEYS + ("AllowedRanks", "AllowedUsers"):
+            if key not in data:
+                raise ValueError(f"Missing setting \"{key}\".")
+
+        for key in ("AllowedRanks", "AllowedUsers"):
+            if not isinstance(data[key], list) or not all(isinstance(item, str) for item in data[key]):
+                raise ValueError(f"\"{key}\" must be a list of strings.")
+
+        for key in Settings.RUNTIME_KEYS:
+            if key in data:
+                Settings.validate_value(key, data[key])
+
+    @staticmethod
+    def validate_value(key, value):
+        # Raises a ValueError if value is not valid for the runtime setting key
+        expected = Settings.RUNTIME_KEYS[key][1]
+        if expected is bool and not isinstance(value, bool):
+            raise ValueError(f"\"{key}\" must be true or false.")
+        # bool is a subclass of int, so it has to be excluded explicitly
+        if expected is int and (isinstance(value, bool) or not isinstance(value, int) or value < 1):
+            raise ValueError(f"\"{key}\" must be a positive integer.")
+
+    @staticmethod
+    def get_runtime_updates(data, previous=None):
+        # Maps the runtime settings in data to bot attributes.
+        # If previous is given, only the settings that differ from it are included.
+        updates = {}
+        for key, attr in (("AllowedRanks", "allowed_ranks"), ("AllowedUsers", "allowed_users")):
+            if key in data and (previous is None or data[key] != previous.get(key)):
+                updates[attr] = [item.lower() for item in data[key]]
+
+        for key, (attr, _) in Settings.RUNTIME_KEYS.items():
+            if key in data and (previous is None or data[key] != previous.get(key)):
+                updates[attr] = data[key]
+        return updates
+
+    def start_watching(self):
+        # Start a background thread reloading settings.json whenever it is modified
+        if self.watcher is None:
+            self.stopping.clear()
+            self.watcher = threading.Thread(target=self.watch, daemon=True)
+            self.watcher.start()
+
+    def stop_watching(self):
+        # Stop the watcher thread and write any pending changes, as the bot is about to exit
+        if self.watcher is not None:
+            self.stopping.set()
+            self.watcher.join()
+            self.watcher = None
+        self.flush()
+
+    def watch(self):
+        missing = False
+        while not self.stopping.wait(Settings.WATCH_INTERVAL):
+            try:
+                mtime = os.stat(Settings.PATH).st_mtime_ns
+            except OSError as e:
+                # Only warn once, until the file can be checked again
+                if not missing:
+                    logger.warning(f"Unable to check settings file for changes: {e}")
+                    missing = True
+                continue
+            missing = False
+
+            if mtime != self.mtime:
+                self.reload()
+
+    def reload(self):
+        # Apply the fields that changed in settings.json to the running bot.
+        # The file is validated as a whole first, so either every change is applied or none is.
+        start_time = time.perf_counter()
+        with self.lock:
+            mtime = None
+            try:
+                # Stat before reading, so a write finishing after a failed read
+                # still counts as a change, and gets reloaded on the next check
+                mtime = os.stat(Settings.PATH).st_mtime_ns
+                mtime, data = self.read()
+                self.validate(data)
+            except (OSError, ValueError) as e:
+                # Remember the broken version so it is not retried until the file is saved again
+                if mtime is not None:
+                    self.mtime = mtime
+                self.valid = False
+                logger.error(f"Ignoring invalid settings file, keeping current settings: {e}")
+                return False
+
+            for key in Settings.CONNECTION_KEYS:
+                if data[key] != self.data[key]:
+                    # Connection settings are kept in the file, but only used after a restart
+                    logger.warning(f"Changing \"{key}\" only takes effect after restarting the bot.")
+
+            updates = self.get_runtime_updates(data, self.data)
+            self.bot.update_settings(updates)
+            self.data = data
+            self.mtime = mtime
+            self.valid = True
+
+            if self.unsaved:
+                # Save the mod command changes that were held back while the file was invalid
+                self.unsaved = False
+                self.save()
+
+        logger.info(f"Reloaded settings ({', '.join(updates) or 'no changes'}) in {(time.perf_counter() - start_time) * 1000:.1f}ms.")
+        return True
+
+    def save(self):
+        # Schedule writing the bot's current runtime settings to settings.json.
+        # Repeated calls within SAVE_DELAY seconds are combined into a single write.
+        with self.lock:
+            if self.save_timer is not None:
+                self.save_timer.cancel()
+            self.save_timer = threading.Timer(Settings.SAVE_DELAY, self.flush)
+            self.save_timer.daemon = True
+            self.save_timer.start()
+
+    def flush(self):
+        # Write any pending runtime settings to settings.json immediately
+        with self.lock:
+            if self.save_timer is None:
+                return
+            self.save_timer.cancel()
+            self.save_timer = None
+            # This write includes any held back changes, so reload() shouldn't schedule another one
+            self.unsaved = False
+
+            # Pick up edits made to settings.json since the last check, so they aren't overwritten
+            try:
+                mtime = os.stat(Settings.PATH).st_mtime_ns
+            except OSError:
+                mtime = None
+            if mtime != self.mtime:
+                self.reload()
+            if not self.valid:
+                self.unsaved = True
+                logger.error("Not saving settings until the settings file is fixed.")
+                return
+
+            data = dict(self.data)
+            for key, (attr, _) in Settings.RUNTIME_KEYS.items():
+                value = getattr(self.bot, attr)
+                try:
+                    self.validate_value(key, value)
+                except ValueError as e:
+                    # Keep what the file had for this setting, but still save the others
+                    logger.error(f"Not saving setting: {e}")
+                    continue
+                data[key] = value
+
+            # Write to a temporary file first so settings.json is never left half written.
+            # The real path is used so a symlinked settings file is updated rather than replaced,
+            # and the temporary file gets the original's permissions as it holds the oauth token.
+            real_path = os.path.realpath(Settings.PATH)
+            tmp_path = real_path + ".tmp"
+            try:
+                mode = stat.S_IMODE(os.stat(real_path).st_mode)
+                with os.fdopen(os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w") as f:
+                    os.chmod(tmp_path, mode)
+                    f.write(json.dumps(data, indent=4, separators=(",", ": ")))
+                os.replace(tmp_path, real_path)
+                self.mtime = os.stat(Settings.PATH).st_mtime_ns
+            except OSError as e:
+                logger.error(f"Failed saving settings: {e}")
+                # Don't leave a second copy of the credentials behind
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+                return
+
+            self.data = data
+            logger.debug("Saved settings.")
 
     @staticmethod
     def get_channel():
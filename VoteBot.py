@@ -22,18 +22,12 @@ class VoteBot:
         capability = ["tags"]
         self.chan = None
         self.nick = None
-        self.sending_message = True
         self.curr_prompt = prompt
         self.updated = mp.Value(c_bool, True)
+        # phase times and modes start at their defaults, settings.json overrides them if it has them
+        self.update_settings(Settings.get_runtime_updates(Settings.DEFAULTS))
         self.autovote = autovote
         self.log_results = True
-        self.skip_voting = False
-        self.random_collection = False
-        self.collecting_time = 120
-        self.voting_time = 120
-        self.stream_delay = 2
-        self.vote_cooldown = 120
-        self.commands_collected_max = 5
         self.commands_collected = []
         self.votes_collected = []
         self.prompt = prompt
@@ -45,7 +39,7 @@ class VoteBot:
             self.pf = ProfanityFilter(custom_censor_list=censor)
 
         logging.debug("Setting settings.")
-        Settings(self)
+        self.settings = Settings(self)
 
         logging.debug("Creating Database instance.")
         self.db = Database(self.chan)
@@ -61,12 +55,22 @@ class VoteBot:
                                   live=True)
 
         self.curr_mode = mp.Value(c_char, b's')
+        logging.debug("Watching settings file for changes.")
+        self.settings.start_watching()
         logging.debug("Starting Websocket connection.")
-        self.ws.start_blocking()
+        try:
+            self.ws.start_blocking()
+        finally:
+            # save any mod command changes that are still waiting to be written
+            self.settings.stop_watching()
 
     def set_settings(self, host, port, chan, nick, auth, allowed_ranks, allowed_users):
         self.host, self.port, self.chan, self.nick, self.auth, self.allowed_ranks, self.allowed_users= host, port, chan, nick, auth, [rank.lower() for rank in allowed_ranks], [user.lower() for user in allowed_users]
 
+    def update_settings(self, updates): # applies settings reloaded from settings.json, called with the settings lock held
+        for attr, value in updates.items():
+            setattr(self, attr, value)
+
     def not_bool(self, setting): # switches setting
         return not setting
 
@@ -92,6 +96,7 @@ class VoteBot:
             if setting > 0: self.vote_cooldown = setting
             else: setting = self.vote_cooldown
             self.ws.send_message("Cooldown time (seconds): " + str(setting))
+            self.settings.save()
 
         elif m.message.startswith("!times"):
             # set all 3 phase times
@@ -103,12 +108,14 @@ class VoteBot:
             if setting > 0: self.voting_time = setting
             else: setting = self.voting_time
             self.ws.send_message("Voting time (seconds): " + str(setting))
+            self.settings.save()
 
         elif m.message.startswith(("!rand", "!random")):
             # sets random collection mode
             setting = self.not_bool(self.random_collection)
             self.random_collection = setting
             self.ws.send_message("Random Collection Mode: " + str(setting))
+            self.settings.save()
 
         elif m.message.startswith("!ctime"):
             # set collecting phase time
@@ -116,12 +123,14 @@ class VoteBot:
             if setting > 0: self.collecting_time = setting
             else: setting = self.collecting_time
             self.ws.send_message("Collecting time (seconds): " + str(setting))
+            self.settings.save()
 
         elif m.message.startswith("!msg"):
             # set to have responses sent to chat
             setting = self.not_bool(self.sending_message)
             self.sending_message = setting
             self.ws.send_message("Sending chat messages: " + str(setting))
+            self.settings.save()
 
         elif m.message.startswith("!stop"):
             # end voting, remove HTML
@@ -136,6 +145,7 @@ class VoteBot:
             setting = self.not_bool(self.autovote)
             self.autovote = setting
             self.ws.send_message("Autovote mode: " + str(setting))
+            self.settings.save()
 
         elif m.message.startswith("!max"):
             # sets max amount of suggestions
@@ -143,6 +153,7 @@ class VoteBot:
             if setting > 0: self.commands_collected_max = setting
             else: setting = self.commands_collected_max
             self.ws.send_message("Max candidates: " + str(setting))
+            self.settings.save()
 
         elif m.message.startswith("!dtime"):
             # sets stream delay time
@@ -150,6 +161,7 @@ class VoteBot:
             if setting > 0: self.stream_delay = setting
             else: setting = self.stream_delay
             self.ws.send_message("Stream delay (seconds): " + str(setting))
+            self.settings.save()
 
         elif m.message.startswith("!ballot"):
             # sends ballot.txt info to vote panel (optionally send custom vote phase time)
@@ -164,6 +176,7 @@ class VoteBot:
             setting = self.not_bool(self.skip_voting)
             self.skip_voting = setting
             self.ws.send_message("Skipping voting phase: " + str(setting))
+            self.settings.save()
 
         elif m.message.startswith("!r"):
             # removes a vote suggestion
@@ -187,7 +200,9 @@ class VoteBot:
         if m.type == "366":
             logging.info(f"Successfully joined channel: #{m.channel}")
         elif m.type == "PRIVMSG":
-            if self.check_permissions(m) and self.check_mod_commands(m): # check if command is a mod command first
+            with self.settings.lock: # keeps mod commands from interleaving with a settings reload
+                is_mod_command = self.check_permissions(m) and self.check_mod_commands(m)
+            if is_mod_command: # check if command is a mod command first
                 return
             elif m.message.lower().startswith(("!v", "!vote")): # main voting command
                 if self.curr_mode.value in (b'r', b'c'): # if ready to collect or currently collecting
@@ -215,11 +230,16 @@ class VoteBot:
             for i, time in enumerate(times):
                 if i < len(def_times):
                     def_times[i] = int(time)
+            if min(def_times) < 1:
+                # reject the whole command, like the single time commands do
+                self.ws.send_whisper(m.user, "Times must be positive.")
+                return
             # 1 to 3 numbers can be provided to set the times
             # 1st: collecting time, 2nd: voting time, 3rd: cooldown time
             self.collecting_time = def_times[0]
             self.voting_time = def_times[1]
             self.vote_cooldown = def_times[2]
+            self.settings.save()
             self.ws.send_message("Times (seconds) - Collection: " + str(self.collecting_time) + " | Voting: " + str(self.voting_time) + " | Cooldown: " + str(self.vote_cooldown))
 
         except Exception:
@@ -384,12 +404,16 @@ class VoteBot:
         vote_collector.start()
 
     def command_collector(self, mode):
-        self.wait_for_updates(self.collecting_time, mode, "collecting-prompt", skip_voting=self.skip_voting)
+        with self.settings.lock: # read settings together so a reload can't mix old and new values
+            collecting_time, skip_voting = self.collecting_time, self.skip_voting
+        self.wait_for_updates(collecting_time, mode, "collecting-prompt", skip_voting=skip_voting)
         if not self.curr_mode.value in (b's', b'l'): # start voting phase if not stopped
-            if self.random_collection:
+            with self.settings.lock:
+                random_collection, autovote, skip_voting, voting_time = self.random_collection, self.autovote, self.skip_voting, self.voting_time
+            if random_collection:
                 self.get_random_commands()
 
-            self.start_vote_collector(self.autovote, self.skip_voting, self.voting_time)
+            self.start_vote_collector(autovote, skip_voting, voting_time)
         elif self.log_results: # log results if collection stops before voting phase
             self.save_vote_log()
 